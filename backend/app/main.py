@@ -1,26 +1,49 @@
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+import httpx
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
+from app.responses import PreferredJSONResponse
 from app.routers import sitemap
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One HTTP client for the app's lifetime: connection pool, keep-alive and
+    # TLS sessions persist across requests instead of being torn down per call
+    async with httpx.AsyncClient(
+        follow_redirects=True,
+        http2=True,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+    ) as client:
+        app.state.http = client
+        yield
+
+
 app = FastAPI(
     title="Intelligent Sitemap Prioritizer",
     description="Rank sitemap URLs by relevance to prioritized keywords.",
     version="1.0.0",
+    default_response_class=PreferredJSONResponse,
+    lifespan=lifespan,
 )
 
-# CORS: allow frontend origin and common patterns for Render
+# CORS: explicit frontend origins via ALLOWED_ORIGINS (comma-separated), plus a
+# compiled-once localhost regex for dev. Credentials stay off: the API is
+# cookie-less, and browsers reject wildcard origins combined with credentials
+# anyway. Explicit origins let the middleware short-circuit to a set lookup.
+_allowed_origins = tuple(
+    o.strip() for o in os.environ.get("ALLOWED_ORIGINS", "").split(",") if o.strip()
+)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "*"
-    ],
-    allow_credentials=True,
+    allow_origins=_allowed_origins or ("*",),
+    allow_origin_regex=r"^https?://(localhost|127\.0\.0\.1)(:\d+)?$",
+    allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
 )
@@ -32,6 +55,12 @@ static_dir = Path(__file__).resolve().parent.parent / "static"
 if static_dir.is_dir() and (static_dir / "index.html").is_file():
     app.mount("/assets", StaticFiles(directory=static_dir / "assets"), name="assets")
 
+    # Snapshot of the build's files taken once at startup: a set lookup on the
+    # hot catch-all path replaces a stat(2) syscall per request
+    _static_files = frozenset(
+        str(p.relative_to(static_dir)) for p in static_dir.rglob("*") if p.is_file()
+    )
+
     @app.get("/")
     def index():
         return FileResponse(static_dir / "index.html")
@@ -40,11 +69,9 @@ if static_dir.is_dir() and (static_dir / "index.html").is_file():
     def catch_all(path: str):
         """Serve index.html for client-side routing."""
         if path.startswith("api") or path.startswith("assets"):
-            from fastapi import HTTPException
             raise HTTPException(status_code=404, detail="Not found")
-        fp = static_dir / path
-        if fp.is_file():
-            return FileResponse(fp)
+        if path in _static_files:
+            return FileResponse(static_dir / path)
         return FileResponse(static_dir / "index.html")
 else:
     @app.get("/")
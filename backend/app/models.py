@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Optional
 from pydantic import BaseModel, Field
 
@@ -20,7 +21,10 @@ class SitemapRequest(BaseModel):
     )
 
 
-class UrlResult(BaseModel):
+# Internal DTO, constructed once per sitemap URL: a slotted dataclass skips
+# Pydantic's per-row validation and per-instance __dict__
+@dataclass(slots=True)
+class UrlResult:
     url: str
     matched_category: str
     priority_score: float  # NLP similarity-based; same rank for semantically similar terms (e.g. health/wellness)
@@ -0,0 +1,9 @@
+"""JSON response class shared by the app: orjson when installed, stdlib otherwise."""
+
+try:
+    import orjson  # noqa: F401 - ORJSONResponse requires it at render time
+    from fastapi.responses import ORJSONResponse as PreferredJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as PreferredJSONResponse
+
+__all__ = ["PreferredJSONResponse"]
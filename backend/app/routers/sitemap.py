@@ -1,9 +1,10 @@
 import logging
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from httpx import HTTPStatusError, RequestError
 
 from app.models import SitemapRequest, SitemapResponse, UrlResult
+from app.responses import PreferredJSONResponse
 from app.services.sitemap_service import prioritize_sitemap
 
 logger = logging.getLogger(__name__)
@@ -11,16 +12,18 @@ router = APIRouter(prefix="/api", tags=["sitemap"])
 
 
 @router.post("/prioritize", response_model=SitemapResponse)
-async def prioritize(request: SitemapRequest):
+async def prioritize(payload: SitemapRequest, request: Request):
     """Fetch sitemap, score URLs by keyword relevance, return sorted list."""
-    sitemap_url = (request.sitemap_url or "").strip()
+    sitemap_url = (payload.sitemap_url or "").strip()
     if not sitemap_url:
         raise HTTPException(status_code=400, detail="sitemap_url is required")
     if not sitemap_url.startswith(("http://", "https://")):
         raise HTTPException(status_code=400, detail="sitemap_url must be a valid HTTP(S) URL")
 
     try:
-        results: list[UrlResult] = await prioritize_sitemap(sitemap_url, request.keywords)
+        results: list[UrlResult] = await prioritize_sitemap(
+            sitemap_url, payload.keywords, client=request.app.state.http
+        )
     except RequestError as e:
         logger.exception("Request error fetching sitemap")
         raise HTTPException(
@@ -42,4 +45,22 @@ async def prioritize(request: SitemapRequest):
             detail=f"Service temporarily unavailable. Try again in a moment. ({str(e)[:100]})",
         )
 
-    return SitemapResponse(total_urls=len(results), results=results)
+    # Serialize the rows ourselves and hand back a Response directly: for
+    # 100k-URL sitemaps the output-model validation pass costs more than the
+    # scoring, and orjson encodes the payload several times faster than stdlib
+    return PreferredJSONResponse(
+        {
+            "total_urls": len(results),
+            "results": [
+                {
+                    "url": r.url,
+                    "matched_category": r.matched_category,
+                    "priority_score": r.priority_score,
+                    "url_depth": r.url_depth,
+                    "last_modified": r.last_modified,
+                }
+                for r in results
+            ],
+            "error": None,
+        }
+    )
@@ -0,0 +1,44 @@
+"""
+String-crunching helpers hot enough to be worth AOT compilation.
+
+This module is kept free of third-party imports and fully annotated so it can
+be compiled as-is with mypyc (``python -m mypyc app/services/_kernels.py``,
+done during the Docker build); the compiled extension shadows this file and
+the callers in sitemap_service need no changes. Plain CPython runs the same
+code uncompiled.
+"""
+import re
+
+# Path tokenizer: compiled once so the per-URL hot loops skip the re-cache lookup
+_SPLIT_RE = re.compile(r"[/\-_.]+")
+
+
+def tag_local_name(tag: str) -> str:
+    if not tag:
+        return ""
+    if "}" in tag:
+        return tag.split("}", 1)[1]
+    return tag
+
+
+def path_depth(path: str) -> int:
+    """Depth of an already-parsed URL path ('' or '/' -> 0, '/a/b' -> 2)."""
+    stripped = (path or "").strip("/")
+    if not stripped:
+        return 0
+    return stripped.count("/") + 1
+
+
+def path_terms(path_lower: str) -> list[str]:
+    """Extract tokens from URL path (split by / and -). Used for NLP similarity."""
+    if not path_lower:
+        return []
+    parts = _SPLIT_RE.split(path_lower)
+    return [p for p in parts if len(p) > 1]
+
+
+def path_to_sentence(path_lower: str) -> str:
+    """Turn URL path into a phrase for embedding (e.g. /blog/health-news -> blog health news)."""
+    if not path_lower:
+        return ""
+    return " ".join(_SPLIT_RE.split(path_lower)).strip()
@@ -1,12 +1,33 @@
-import re
-from urllib.parse import urlparse
+import asyncio
+import zlib
+from functools import lru_cache
+from urllib.parse import urlsplit
 from typing import Optional
+from xml.etree.ElementTree import ParseError, XMLPullParser
 
 import httpx
 import numpy as np
-from defusedxml import ElementTree as ET
+
+try:
+    import ahocorasick  # pyahocorasick: C multi-pattern matcher for exact keyword scans
+except Exception:
+    ahocorasick = None
+
+try:
+    from lxml import etree as LET  # libxml2-backed pull parser: C-level element handling
+except Exception:
+    LET = None
+
+# Parse failures the stream parser can raise, per backend
+_XML_PARSE_ERRORS = (ParseError,) if LET is None else (ParseError, LET.XMLSyntaxError)
 
 from app.models import KeywordPriorities, UrlResult
+from app.services._kernels import (
+    path_depth as _path_depth,
+    path_terms as _path_terms,
+    path_to_sentence as _path_to_sentence,
+    tag_local_name as _tag_local_name,
+)
 
 # Lazy-loaded spaCy NLP model for semantic similarity (e.g. health ~ wellness)
 _nlp = None
@@ -25,19 +46,95 @@ def _get_nlp():
     return _nlp if _nlp else None
 
 
+_EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class _OnnxMiniLMEncoder:
+    """
+    MiniLM on ONNX Runtime with dynamically INT8-quantized matmuls: tokenize in
+    batches, run the session, mean-pool over the attention mask, L2-normalize.
+    Drop-in for SentenceTransformer.encode for the kwargs this module uses.
+    """
+
+    def __init__(self, model_dir: str) -> None:
+        import os
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._session = ort.InferenceSession(
+            os.path.join(model_dir, "model_quantized.onnx"),
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+    def encode(
+        self,
+        sentences: list[str],
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        chunks = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            enc = self._tokenizer(
+                batch, padding="longest", truncation=True, max_length=256, return_tensors="np"
+            )
+            feeds = {k: v for k, v in enc.items() if k in self._input_names}
+            hidden = self._session.run(None, feeds)[0]  # (B, T, H)
+            mask = enc["attention_mask"][:, :, None].astype(hidden.dtype)
+            chunks.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        if not chunks:
+            return np.zeros((0, 384), dtype=np.float32)
+        embs = np.concatenate(chunks, axis=0)
+        if normalize_embeddings:
+            embs /= np.clip(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12, None)
+        return embs
+
+
+def _build_onnx_encoder() -> _OnnxMiniLMEncoder:
+    """Export MiniLM to ONNX and INT8-quantize it once; later starts reuse the cache."""
+    import os
+
+    cache_dir = os.environ.get("ONNX_MODEL_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "sitemap-prioritizer", "minilm-int8"
+    )
+    if not os.path.isfile(os.path.join(cache_dir, "model_quantized.onnx")):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        ORTModelForFeatureExtraction.from_pretrained(_EMBED_MODEL_NAME, export=True).save_pretrained(cache_dir)
+        AutoTokenizer.from_pretrained(_EMBED_MODEL_NAME).save_pretrained(cache_dir)
+        ORTQuantizer.from_pretrained(cache_dir).quantize(
+            save_dir=cache_dir,
+            quantization_config=AutoQuantizationConfig.avx2(is_static=False),
+        )
+    return _OnnxMiniLMEncoder(cache_dir)
+
+
 def _get_embed_model():
-    """Load sentence-transformers model for phrase-level embeddings (health/wellness same rank)."""
+    """Load the phrase-embedding encoder (health/wellness same rank): quantized
+    ONNX build when onnxruntime/optimum are present, else sentence-transformers."""
     global _embed_model
     if _embed_model is None:
         import os
         if os.environ.get("DISABLE_SENTENCE_TRANSFORMERS", "").lower() in ("1", "true", "yes"):
             _embed_model = False
         else:
-            try:
-                from sentence_transformers import SentenceTransformer
-                _embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-            except Exception:
-                _embed_model = False
+            if os.environ.get("DISABLE_ONNX_EMBEDDINGS", "").lower() not in ("1", "true", "yes"):
+                try:
+                    _embed_model = _build_onnx_encoder()
+                except Exception:
+                    _embed_model = None
+            if not _embed_model:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    _embed_model = SentenceTransformer("all-MiniLM-L6-v2")
+                except Exception:
+                    _embed_model = False
     return _embed_model if _embed_model else None
 
 
@@ -53,6 +150,58 @@ LASTMOD_TAG = "{%s}lastmod" % SITEMAP_NS["sm"]
 TAG_LOC = "loc"
 TAG_LASTMOD = "lastmod"
 
+# Max simultaneous sitemap fetches when fanning out over a sitemap index
+MAX_CONCURRENT_FETCHES = 16
+
+# Sitemap XML compresses 10-20x; only advertise brotli when we can decode it
+try:
+    import brotli  # noqa: F401 - httpx decodes br responses through it
+    _ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+# Content types for gzip-file sitemaps (sitemap.xml.gz), as opposed to
+# Content-Encoding, which httpx already undoes transparently
+_GZIP_CONTENT_TYPES = ("application/gzip", "application/x-gzip")
+
+# Overlap carried between chunk scans so a DOCTYPE split across a chunk
+# boundary is still seen whole (len("<!DOCTYPE") - 1)
+_DTD_TAIL_BYTES = 8
+
+# Conditional-GET cache: sitemap URL -> (etag, last_modified, parsed items, is_index).
+# A 304 response reuses the cached parse and skips the body download entirely.
+# Bounded by total cached (url, lastmod) tuples, not entry count, so a handful
+# of huge sitemaps cannot pin unbounded memory; oversized parses skip the cache.
+_SITEMAP_CACHE_MAX_ENTRIES = 256
+_SITEMAP_CACHE_MAX_ITEMS = 200_000
+_SITEMAP_CACHE_MAX_ENTRY_ITEMS = 20_000
+_sitemap_cache: dict[str, tuple[Optional[str], Optional[str], list[tuple[str, Optional[str]]], bool]] = {}
+_sitemap_cache_items = 0  # total tuples currently cached; guarded by the lock
+_sitemap_cache_lock = asyncio.Lock()
+
+
+def _sitemap_cache_store(
+    sitemap_url: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+    items: list[tuple[str, Optional[str]]],
+    is_index: bool,
+) -> None:
+    """Insert a parse (call with the cache lock held) and evict oldest entries
+    until both the entry and total-item budgets hold."""
+    global _sitemap_cache_items
+    old = _sitemap_cache.pop(sitemap_url, None)
+    if old is not None:
+        _sitemap_cache_items -= len(old[2])
+    _sitemap_cache[sitemap_url] = (etag, last_modified, items, is_index)
+    _sitemap_cache_items += len(items)
+    while _sitemap_cache and (
+        _sitemap_cache_items > _SITEMAP_CACHE_MAX_ITEMS
+        or len(_sitemap_cache) > _SITEMAP_CACHE_MAX_ENTRIES
+    ):
+        oldest = next(iter(_sitemap_cache))
+        _sitemap_cache_items -= len(_sitemap_cache.pop(oldest)[2])
+
 
 def _get_text(el, tag: str, default: Optional[str] = None) -> Optional[str]:
     if el is None:
@@ -69,69 +218,85 @@ def _get_text(el, tag: str, default: Optional[str] = None) -> Optional[str]:
     return (child.text or "").strip() or default
 
 
-def _tag_local_name(tag: str) -> str:
-    if not tag:
-        return ""
-    if "}" in tag:
-        return tag.split("}", 1)[1]
-    return tag
-
-
-def _extract_urls_from_xml(content: str) -> tuple[list[tuple[str, Optional[str]]], bool]:
+class _SitemapStreamParser:
     """
-    Parse sitemap XML. Returns (list of (url, lastmod), is_index).
-    If is_index True, URLs are child sitemap URLs to fetch.
+    Incremental sitemap parser: feed response byte chunks, collect (loc, lastmod)
+    tuples as <url>/<sitemap> elements complete. Consumed elements are cleared
+    immediately so memory stays flat no matter how large the sitemap is.
+
+    Every chunk is scanned for a DOCTYPE (with an overlap tail so one split
+    across chunk boundaries is still seen) and the document rejected if one
+    appears anywhere: entity-expansion attacks all require a DTD, no real
+    sitemap carries one, and comments/PIs may legally push a DOCTYPE
+    arbitrarily deep into the stream.
     """
-    root = ET.fromstring(content)
-    results: list[tuple[str, Optional[str]]] = []
-    root_local = _tag_local_name(root.tag or "")
-
-    # Sitemap index: list of sitemap URLs
-    if root_local == "sitemapindex":
-        for sitemap_el in root:
-            loc = _get_text(sitemap_el, "loc")
-            if loc:
-                results.append((loc.strip(), None))
-        return results, True
 
-    # URL set
-    if root_local == "urlset":
-        for url_el in root:
-            if _tag_local_name(url_el.tag or "") != "url":
+    def __init__(self) -> None:
+        if LET is not None:
+            self._parser = LET.XMLPullParser(
+                events=("start", "end"),
+                resolve_entities=False,
+                no_network=True,
+            )
+        else:
+            self._parser = XMLPullParser(events=("start", "end"))
+        self._root = None
+        self._saw_bytes = False
+        self._tail = b""
+        self.is_index = False
+        self.items: list[tuple[str, Optional[str]]] = []
+
+    def feed(self, chunk: bytes) -> None:
+        if chunk:
+            self._saw_bytes = True
+            window = self._tail + chunk
+            if b"<!DOCTYPE" in window:
+                raise ValueError("Sitemap XML with a DTD is not allowed")
+            self._tail = window[-_DTD_TAIL_BYTES:]
+        self._parser.feed(chunk)
+        self._drain()
+
+    def close(self) -> tuple[list[tuple[str, Optional[str]]], bool]:
+        try:
+            self._parser.close()
+        except _XML_PARSE_ERRORS:
+            if not self._saw_bytes or self._root is None:
+                raise ValueError("Sitemap returned empty content")
+            raise
+        self._drain()
+        if self._root is None:
+            raise ValueError("Sitemap returned empty content")
+        return self.items, self.is_index
+
+    def _drain(self) -> None:
+        for event, elem in self._parser.read_events():
+            # lxml reports comments/PIs with non-string tags; skip them
+            tag = elem.tag if isinstance(elem.tag, str) else ""
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+                    self.is_index = _tag_local_name(tag) == "sitemapindex"
                 continue
-            loc = _get_text(url_el, "loc")
-            if not loc:
+            if _tag_local_name(tag) not in ("url", "sitemap"):
                 continue
-            lastmod = _get_text(url_el, "lastmod")
-            results.append((loc.strip(), lastmod))
-    return results, False
-
-
-def _url_depth(url: str) -> int:
-    parsed = urlparse(url)
-    path = (parsed.path or "").strip("/")
-    if not path:
-        return 0
-    return len(path.split("/"))
-
-
-def _path_terms(path_lower: str) -> list[str]:
-    """Extract tokens from URL path (split by / and -). Used for NLP similarity."""
-    if not path_lower:
-        return []
-    parts = re.split(r"[/\-_.]+", path_lower)
-    return [p for p in parts if len(p) > 1]
-
-
-def _cosine_similarity(v1: np.ndarray, v2: np.ndarray) -> float:
-    n1, n2 = np.linalg.norm(v1), np.linalg.norm(v2)
-    if n1 == 0 or n2 == 0:
-        return 0.0
-    return float(np.dot(v1, v2) / (n1 * n2))
-
-
-def _keyword_vectors(nlp, keyword_list: list[str]) -> list[np.ndarray]:
-    """Get one vector per keyword (average of token vectors for multi-word)."""
+            loc = _get_text(elem, "loc")
+            if loc:
+                lastmod = None if self.is_index else _get_text(elem, "lastmod")
+                self.items.append((loc.strip(), lastmod))
+            elem.clear()
+            parent = elem.getparent() if hasattr(elem, "getparent") else None
+            if parent is not None:
+                # lxml: drop already-consumed siblings from the parent
+                while elem.getprevious() is not None:
+                    del parent[0]
+            elif self._root is not None and self._root is not elem:
+                # stdlib ET: drop the cleared stub so the root keeps no children
+                self._root.clear()
+
+
+def _keyword_vectors(nlp, keyword_list: list[str]) -> np.ndarray:
+    """One unit-norm row per keyword (average of token vectors for multi-word),
+    stacked into a single float32 matrix so tier scoring is a plain matmul."""
     vectors = []
     for k in keyword_list:
         doc = nlp(k.lower().strip())
@@ -141,58 +306,74 @@ def _keyword_vectors(nlp, keyword_list: list[str]) -> list[np.ndarray]:
         if not vecs:
             continue
         vectors.append(np.mean(vecs, axis=0))
-    return vectors
+    dim = getattr(nlp.vocab, "vectors_length", 0) or 300
+    return _stack_normalized(vectors, dim)
+
+
+@lru_cache(maxsize=1024)
+def _tier_vectors(kw_tuple: tuple[str, ...]) -> np.ndarray:
+    """Cached per-tier keyword matrix. Frontends reuse a handful of canonical
+    tier lists, and the nlp model is a process-wide singleton, so keying on the
+    normalized keyword tuple alone is safe."""
+    return _keyword_vectors(_get_nlp(), list(kw_tuple))
+
+
+def _tier_key(keyword_list: list[str]) -> tuple[str, ...]:
+    """Normalize a tier to a cache key; order/dupes don't affect max-similarity."""
+    return tuple(sorted({k.lower().strip() for k in keyword_list if k.strip()}))
+
+
+# Term -> unit vector (or None when the model has no vector for it), shared
+# across requests since path terms repeat heavily between sitemaps
+_TERM_CACHE_MAX = 131072
+_term_vector_cache: dict[str, Optional[np.ndarray]] = {}
+
+
+def _max_sim_matrix(term_mat: np.ndarray, kw_mat: np.ndarray) -> np.ndarray:
+    """Per-term max cosine against a keyword pool; both matrices pre-normalized.
+    One batched matmul replaces the old pairwise loop."""
+    if term_mat.shape[0] == 0 or kw_mat.shape[0] == 0:
+        return np.zeros(term_mat.shape[0], dtype=np.float32)
+    return np.maximum((term_mat @ kw_mat.T).max(axis=1), 0.0)
+
+
+def _stack_normalized(vectors: list[np.ndarray], dim: int) -> np.ndarray:
+    """Stack a list of vectors into one L2-normalized float32 matrix (SoA layout)."""
+    if not vectors:
+        return np.zeros((0, dim), dtype=np.float32)
+    mat = np.stack(vectors).astype(np.float32)
+    mat /= np.linalg.norm(mat, axis=1, keepdims=True) + 1e-9
+    return mat
 
 
 def _score_url_nlp(
     path_lower: str,
     keywords: KeywordPriorities,
-    nlp,
-    term_vectors: dict[str, np.ndarray],
-    kw_high: list[np.ndarray],
-    kw_medium: list[np.ndarray],
-    kw_low: list[np.ndarray],
+    term_index: dict[str, int],
+    high_term_sims: np.ndarray,
+    med_term_sims: np.ndarray,
+    low_term_sims: np.ndarray,
 ) -> tuple[float, str]:
     """
-    Score URL by semantic similarity. Terms like 'health' and 'wellness' get similar
-    scores so they rank together. Weights: High=3, Medium=2, Low=1.
+    Score URL by semantic similarity using per-term tier similarities precomputed
+    in one batched pass. Terms like 'health' and 'wellness' get similar scores so
+    they rank together. Weights: High=3, Medium=2, Low=1.
     """
     terms = _path_terms(path_lower)
     if not terms:
         return 0.0, "Unmatched"
+    idxs = [term_index[t] for t in terms if t in term_index]
 
-    def max_sim(term_vecs: list[np.ndarray], kw_vecs: list[np.ndarray]) -> float:
-        if not kw_vecs:
-            return 0.0
-        best = 0.0
-        for tvec in term_vecs:
-            for kvec in kw_vecs:
-                sim = _cosine_similarity(tvec, kvec)
-                if sim > best:
-                    best = sim
+    def tier_sim(term_sims: np.ndarray, tier_keywords: list[str]) -> float:
+        best = float(term_sims[idxs].max()) if idxs and term_sims.size else 0.0
+        # fallback to 1.0 for exact match if keyword in path
+        if best < 1.0 and any(k in path_lower for k in tier_keywords):
+            best = 1.0
         return best
 
-    def exact_match_sim(tier_keywords: list[str]) -> float:
-        for k in tier_keywords:
-            if k in path_lower:
-                return 1.0
-        return 0.0
-
-    term_vecs = []
-    for t in terms:
-        if t in term_vectors:
-            term_vecs.append(term_vectors[t])
-        else:
-            doc = nlp(t)
-            v = getattr(doc, "vector", None)
-            if v is not None and np.linalg.norm(v) > 0:
-                term_vecs.append(v)
-                term_vectors[t] = v
-
-    # Use similarity; fallback to 1.0 for exact match if keyword in path
-    high_sim = max(max_sim(term_vecs, kw_high) if kw_high else 0.0, exact_match_sim(keywords.High))
-    med_sim = max(max_sim(term_vecs, kw_medium) if kw_medium else 0.0, exact_match_sim(keywords.Medium))
-    low_sim = max(max_sim(term_vecs, kw_low) if kw_low else 0.0, exact_match_sim(keywords.Low))
+    high_sim = tier_sim(high_term_sims, keywords.High)
+    med_sim = tier_sim(med_term_sims, keywords.Medium)
+    low_sim = tier_sim(low_term_sims, keywords.Low)
 
     # Weighted score: same rank for semantically similar terms (e.g. health ≈ wellness)
     weighted_high = 3.0 * high_sim
@@ -211,45 +392,95 @@ def _score_url_nlp(
     return round(total, 4), best
 
 
-def _path_to_sentence(path_lower: str) -> str:
-    """Turn URL path into a phrase for embedding (e.g. /blog/health-news -> blog health news)."""
-    if not path_lower:
-        return ""
-    return " ".join(re.split(r"[/\-_.]+", path_lower)).strip()
-
-
-def _score_url_embed(
-    path_embed: np.ndarray,
-    high_embs: np.ndarray,
-    med_embs: np.ndarray,
-    low_embs: np.ndarray,
-) -> tuple[float, str]:
+def _score_paths_embed(
+    path_embs: np.ndarray,
+    kw_embs: np.ndarray,
+    h_end: int,
+    m_end: int,
+) -> tuple[np.ndarray, np.ndarray]:
     """
-    Score one URL path using its embedding vs keyword embeddings. Same rank for
-    semantically similar phrases (e.g. health / wellness). Weights: High=3, Medium=2, Low=1.
+    Score all URL paths at once: one N x K similarity matmul, then per-tier max.
+    Same rank for semantically similar phrases (e.g. health / wellness).
+    Weights: High=3, Medium=2, Low=1. Returns (scores, categories) arrays.
     """
-    def max_cos(v: np.ndarray, pool: np.ndarray) -> float:
-        if pool is None or (hasattr(pool, "shape") and (len(pool) == 0 or pool.size == 0)):
-            return 0.0
-        sims = np.dot(pool, v) / (np.linalg.norm(pool, axis=1) * np.linalg.norm(v) + 1e-9)
-        return float(np.max(sims).item())
-
-    high_sim = max_cos(path_embed, high_embs)
-    med_sim = max_cos(path_embed, med_embs)
-    low_sim = max_cos(path_embed, low_embs)
+    n, k = path_embs.shape[0], kw_embs.shape[0]
+    # normalize_embeddings=True gives unit vectors, so cosine reduces to dot
+    sims = path_embs @ kw_embs.T
+    zeros = np.zeros(n)
+    high_sim = sims[:, :h_end].max(axis=1) if h_end else zeros
+    med_sim = sims[:, h_end:m_end].max(axis=1) if m_end > h_end else zeros
+    low_sim = sims[:, m_end:].max(axis=1) if k > m_end else zeros
+
     w_high = 3.0 * high_sim
     w_med = 2.0 * med_sim
     w_low = 1.0 * low_sim
-    total = w_high + w_med + w_low
-    if total <= 0:
-        return 0.0, "Unmatched"
-    if w_high >= w_med and w_high >= w_low:
+    totals = w_high + w_med + w_low
+
+    cats = np.where(
+        (w_high >= w_med) & (w_high >= w_low),
+        "High",
+        np.where(w_med >= w_low, "Medium", "Low"),
+    )
+    matched = totals > 0
+    cats = np.where(matched, cats, "Unmatched")
+    # round in float64: rounding the float32 totals leaves artifacts like
+    # 1.412500023841858 once widened for the response
+    scores = np.where(matched, np.round(totals.astype(np.float64), 4), 0.0)
+    return scores, cats
+
+
+def _build_keyword_automaton(keywords: KeywordPriorities):
+    """
+    Build an Aho-Corasick automaton over all keywords so one linear pass over a
+    path finds every match. Returns None if pyahocorasick is unavailable or
+    there are no keywords (callers fall back to _score_url).
+    """
+    if ahocorasick is None:
+        return None
+    # keyword -> (high, medium, low) weight contributions; a keyword listed in
+    # several tiers contributes to each, matching _score_url's per-tier sums
+    weights: dict[str, list[int]] = {}
+    for idx, weight, kw_list in ((0, 3, keywords.High), (1, 2, keywords.Medium), (2, 1, keywords.Low)):
+        for kw in kw_list:
+            kw = kw.lower()
+            if kw:
+                weights.setdefault(kw, [0, 0, 0])[idx] += weight
+    if not weights:
+        return None
+    automaton = ahocorasick.Automaton()
+    for kw, w in weights.items():
+        automaton.add_word(kw, (kw, tuple(w)))
+    automaton.make_automaton()
+    return automaton
+
+
+def _score_url_ac(path_lower: str, automaton) -> tuple[int, str]:
+    """
+    Score URL path via one Aho-Corasick scan. Same weights and category rules
+    as _score_url; each keyword counts once no matter how often it occurs.
+    """
+    high_score = medium_score = low_score = 0
+    seen: set[str] = set()
+    for _, (kw, (h, m, lo)) in automaton.iter(path_lower):
+        if kw in seen:
+            continue
+        seen.add(kw)
+        high_score += h
+        medium_score += m
+        low_score += lo
+
+    total = high_score + medium_score + low_score
+    if total == 0:
+        return 0, "Unmatched"
+    if high_score >= medium_score and high_score >= low_score and high_score > 0:
         best = "High"
-    elif w_med >= w_low:
+    elif medium_score >= low_score and medium_score > 0:
         best = "Medium"
-    else:
+    elif low_score > 0:
         best = "Low"
-    return round(total, 4), best
+    else:
+        best = "Unmatched"
+    return total, best
 
 
 def _score_url(path_lower: str, keywords: KeywordPriorities) -> tuple[int, str]:
@@ -277,95 +508,226 @@ def _score_url(path_lower: str, keywords: KeywordPriorities) -> tuple[int, str]:
     return total, best
 
 
-async def fetch_sitemap_urls(client: httpx.AsyncClient, sitemap_url: str) -> list[tuple[str, Optional[str]]]:
-    """Fetch sitemap and return (url, lastmod) list. Follows sitemap index recursively."""
-    resp = await client.get(sitemap_url, timeout=30.0)
-    resp.raise_for_status()
-    content = resp.text
-    if not content.strip():
-        raise ValueError("Sitemap returned empty content")
-
-    items, is_index = _extract_urls_from_xml(content)
+async def fetch_sitemap_urls(
+    client: httpx.AsyncClient,
+    sitemap_url: str,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> list[tuple[str, Optional[str]]]:
+    """Fetch sitemap and return (url, lastmod) list. Follows sitemap index recursively,
+    fetching child sitemaps concurrently (capped by a semaphore)."""
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+
+    async with _sitemap_cache_lock:
+        cached = _sitemap_cache.get(sitemap_url)
+    headers: dict[str, str] = {"Accept-Encoding": _ACCEPT_ENCODING}
+    if cached is not None:
+        etag, last_modified = cached[0], cached[1]
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    async with semaphore:
+        async with client.stream("GET", sitemap_url, timeout=30.0, headers=headers) as resp:
+            if resp.status_code == 304 and cached is not None:
+                items, is_index = cached[2], cached[3]
+            else:
+                resp.raise_for_status()
+                # Gzip-file sitemaps (sitemap.xml.gz) are decompressed
+                # incrementally so the stream stays constant-memory
+                content_type = resp.headers.get("content-type", "").split(";")[0].strip().lower()
+                gz = None
+                if sitemap_url.lower().endswith(".gz") or content_type in _GZIP_CONTENT_TYPES:
+                    gz = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                # Stream the body straight into the pull parser: one linear
+                # pass, no full-document string or DOM held in memory
+                stream_parser = _SitemapStreamParser()
+                async for chunk in resp.aiter_bytes():
+                    stream_parser.feed(gz.decompress(chunk) if gz is not None else chunk)
+                if gz is not None:
+                    stream_parser.feed(gz.flush())
+                items, is_index = stream_parser.close()
+
+                etag = resp.headers.get("etag")
+                last_modified = resp.headers.get("last-modified")
+                if (etag or last_modified) and len(items) <= _SITEMAP_CACHE_MAX_ENTRY_ITEMS:
+                    async with _sitemap_cache_lock:
+                        _sitemap_cache_store(sitemap_url, etag, last_modified, items, is_index)
 
     if is_index:
+        # Fetch children in parallel: wall time is max-of-RTTs, not sum-of-RTTs
+        subs = await asyncio.gather(
+            *(fetch_sitemap_urls(client, child_url, semaphore) for child_url, _ in items),
+            return_exceptions=True,
+        )
         all_urls: list[tuple[str, Optional[str]]] = []
-        for child_sitemap_url, _ in items:
-            try:
-                sub = await fetch_sitemap_urls(client, child_sitemap_url)
+        for sub in subs:
+            if not isinstance(sub, BaseException):
                 all_urls.extend(sub)
-            except Exception:
-                continue
         return all_urls
 
     return items
 
 
-async def prioritize_sitemap(sitemap_url: str, keywords: KeywordPriorities) -> list[UrlResult]:
-    """Fetch sitemap, score by embeddings (preferred) or spaCy or exact match, sort descending."""
-    async with httpx.AsyncClient(follow_redirects=True, verify=False) as client:
+async def prioritize_sitemap(
+    sitemap_url: str,
+    keywords: KeywordPriorities,
+    client: Optional[httpx.AsyncClient] = None,
+) -> list[UrlResult]:
+    """Fetch sitemap, score by embeddings (preferred) or spaCy or exact match, sort descending.
+
+    Pass the app's long-lived client to reuse its connection pool; without one
+    a short-lived client is created for the call.
+    """
+    if client is not None:
         url_list = await fetch_sitemap_urls(client, sitemap_url)
+    else:
+        async with httpx.AsyncClient(
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        ) as own_client:
+            url_list = await fetch_sitemap_urls(own_client, sitemap_url)
 
     if not url_list:
         return []
 
-    path_by_url = [(url, lastmod, (urlparse(url).path or "").lower()) for url, lastmod in url_list]
-    paths = [p for _, _, p in path_by_url]
-    path_sentences = [_path_to_sentence(p) for p in paths]
+    # Parse each URL exactly once (urlsplit skips the params handling urlparse does)
+    path_by_url = []
+    for url, lastmod in url_list:
+        path = urlsplit(url).path or ""
+        path_by_url.append((url, lastmod, path.lower(), _path_depth(path)))
+    paths = [p for _, _, p, _ in path_by_url]
+    # Big sitemaps repeat paths heavily (trailing-slash/query variants, shared
+    # CMS prefixes): score each distinct path once, then fan back out via inverse.
+    unique_paths_arr, inverse = np.unique(paths, return_inverse=True)
+    unique_paths: list[str] = unique_paths_arr.tolist()
+    path_sentences = [_path_to_sentence(p) for p in unique_paths]
+    exact_automaton = _build_keyword_automaton(keywords)
 
     # 1) Prefer sentence-transformers (phrase-level embeddings)
     embed_model = _get_embed_model()
     if embed_model is not None:
-        path_embs = embed_model.encode(
-            [s or " " for s in path_sentences],
-            normalize_embeddings=True,
-            show_progress_bar=False,
-        )
         high_list = [k.strip().lower() for k in keywords.High if k.strip()]
         med_list = [k.strip().lower() for k in keywords.Medium if k.strip()]
         low_list = [k.strip().lower() for k in keywords.Low if k.strip()]
-        high_embs = embed_model.encode(high_list, normalize_embeddings=True) if high_list else np.zeros((0, path_embs.shape[1]))
-        med_embs = embed_model.encode(med_list, normalize_embeddings=True) if med_list else np.zeros((0, path_embs.shape[1]))
-        low_embs = embed_model.encode(low_list, normalize_embeddings=True) if low_list else np.zeros((0, path_embs.shape[1]))
-        use_embed = high_embs.shape[0] or med_embs.shape[0] or low_embs.shape[0]
+        all_kw = high_list + med_list + low_list
+        use_embed = bool(all_kw)
     else:
         use_embed = False
-        path_embs = high_embs = med_embs = low_embs = None
+
+    if use_embed:
+        n_uniq = len(unique_paths)
+        uniq_scores = np.zeros(n_uniq)
+        uniq_cats = np.full(n_uniq, "Unmatched", dtype="<U9")
+        # Cheap pre-pass: paths that contain a keyword verbatim are scored by
+        # the exact matcher and skip the encoder entirely; only zero-hit paths
+        # need the semantic (health ~ wellness) treatment
+        if exact_automaton is not None:
+            ambiguous = []
+            for j, path in enumerate(unique_paths):
+                s, cat = _score_url_ac(path, exact_automaton)
+                if s > 0:
+                    uniq_scores[j] = float(s)
+                    uniq_cats[j] = cat
+                else:
+                    ambiguous.append(j)
+        else:
+            ambiguous = list(range(n_uniq))
+
+        if ambiguous:
+            path_embs = embed_model.encode(
+                [path_sentences[j] or " " for j in ambiguous],
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                batch_size=128,
+                show_progress_bar=False,
+            )
+            # One batched encode for every tier; tiers are recovered by slicing
+            kw_embs = embed_model.encode(
+                all_kw,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                batch_size=256,
+                show_progress_bar=False,
+            )
+            h_end = len(high_list)
+            m_end = h_end + len(med_list)
+            amb_scores, amb_cats = _score_paths_embed(path_embs, kw_embs, h_end, m_end)
+            uniq_scores[ambiguous] = amb_scores
+            uniq_cats[ambiguous] = amb_cats
 
     # 2) Fallback: spaCy word vectors
     nlp = _get_nlp() if not use_embed else None
     if nlp is not None and not use_embed:
-        kw_high = _keyword_vectors(nlp, keywords.High)
-        kw_medium = _keyword_vectors(nlp, keywords.Medium)
-        kw_low = _keyword_vectors(nlp, keywords.Low)
+        kw_high = _tier_vectors(_tier_key(keywords.High))
+        kw_medium = _tier_vectors(_tier_key(keywords.Medium))
+        kw_low = _tier_vectors(_tier_key(keywords.Low))
         all_terms = set()
-        for _, _, path in path_by_url:
+        for path in unique_paths:
             all_terms.update(_path_terms(path))
+        # Vectorize only terms not seen by any earlier request; nlp.pipe still
+        # batches the cold ones through spaCy in one go
         term_vectors = {}
-        terms_list = list(all_terms)
-        for term, doc in zip(terms_list, nlp.pipe(terms_list)):
+        new_terms = []
+        for term in all_terms:
+            if term in _term_vector_cache:
+                v = _term_vector_cache[term]
+                if v is not None:
+                    term_vectors[term] = v
+            else:
+                new_terms.append(term)
+        for term, doc in zip(new_terms, nlp.pipe(new_terms)):
             v = getattr(doc, "vector", None)
-            if v is not None and np.linalg.norm(v) > 0:
-                term_vectors[term] = v.copy()
-        use_nlp = kw_high or kw_medium or kw_low
+            v = v.copy() if v is not None and np.linalg.norm(v) > 0 else None
+            if len(_term_vector_cache) < _TERM_CACHE_MAX:
+                _term_vector_cache[term] = v
+            if v is not None:
+                term_vectors[term] = v
+        use_nlp = bool(kw_high.shape[0] or kw_medium.shape[0] or kw_low.shape[0])
     else:
         term_vectors = {}
-        kw_high = kw_medium = kw_low = []
         use_nlp = False
 
+    if use_nlp:
+        # One term x keyword matmul per tier up front; per-URL scoring then just
+        # indexes into these arrays instead of re-running pairwise cosines.
+        # Keyword pools arrive pre-stacked and unit-norm from _keyword_vectors.
+        term_index = {t: i for i, t in enumerate(term_vectors)}
+        term_mat = _stack_normalized(list(term_vectors.values()), kw_high.shape[1])
+        high_term_sims = _max_sim_matrix(term_mat, kw_high)
+        med_term_sims = _max_sim_matrix(term_mat, kw_medium)
+        low_term_sims = _max_sim_matrix(term_mat, kw_low)
+    else:
+        term_index = {}
+        high_term_sims = med_term_sims = low_term_sims = np.zeros(0, dtype=np.float32)
+
+    if not use_embed:
+        uniq_scores = np.empty(len(unique_paths))
+        uniq_cats = []
+        for j, path in enumerate(unique_paths):
+            if use_nlp:
+                score, category = _score_url_nlp(
+                    path, keywords, term_index, high_term_sims, med_term_sims, low_term_sims
+                )
+            elif exact_automaton is not None:
+                score, category = _score_url_ac(path, exact_automaton)
+            else:
+                score, category = _score_url(path, keywords)
+            uniq_scores[j] = score
+            uniq_cats.append(category)
+        uniq_cats = np.asarray(uniq_cats)
+
+    n = len(path_by_url)
+    scores = np.empty(n)
+    depths = np.empty(n, dtype=np.int32)
     results: list[UrlResult] = []
-    for i, (url, lastmod, path) in enumerate(path_by_url):
-        if use_embed:
-            score, category = _score_url_embed(
-                path_embs[i], high_embs, med_embs, low_embs
-            )
-        elif use_nlp:
-            score, category = _score_url_nlp(
-                path, keywords, nlp, term_vectors, kw_high, kw_medium, kw_low
-            )
-        else:
-            s, category = _score_url(path, keywords)
-            score = float(s)
-        depth = _url_depth(url)
+    for i, (url, lastmod, path, depth) in enumerate(path_by_url):
+        j = inverse[i]
+        score, category = float(uniq_scores[j]), str(uniq_cats[j])
+        scores[i] = score
+        depths[i] = depth
         results.append(
             UrlResult(
                 url=url,
@@ -376,5 +738,6 @@ async def prioritize_sitemap(sitemap_url: str, keywords: KeywordPriorities) -> l
             )
         )
 
-    results.sort(key=lambda r: (-r.priority_score, -r.url_depth))
-    return results
+    # Sort by (-score, -depth) in C via lexsort (last key is primary, stable)
+    order = np.lexsort((-depths, -scores))
+    return [results[i] for i in order.tolist()]